@@ -1,52 +1,190 @@
 from dotenv import load_dotenv
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import concurrent.futures
 import os
+import threading
 import google.generativeai as genai
 from langchain_community.utilities.sql_database import SQLDatabase
-from langchain_core.messages import AIMessage, HumanMessage
+import numpy as np
 import pandas as pd
 import plotly.express as px
+from sqlalchemy.exc import InterfaceError, OperationalError
 from datetime import datetime
+import hashlib
 import json
+import random
+import re
 import time
 
 # Load environment variables
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# grpc keeps one persistent HTTP/2 channel for all Gemini calls instead of
+# paying a TLS handshake per request
+genai.configure(api_key=os.getenv("GOOGLE_API_KEY"), transport="grpc")
+
+# One model instance shared by every session; GenerativeModel is stateless
+# per-request, so there is no reason to allocate it per user
+_MODEL = genai.GenerativeModel('gemini-pro')
 
 # Constants
 SUPPORTED_VISUALIZATIONS = ['bar', 'line', 'scatter', 'pie']
 MAX_RETRIES = 3
-RETRY_DELAY = 2
+RETRY_BASE_DELAY = 0.1  # seconds; doubles per attempt, plus jitter
+CHAT_HISTORY_WINDOW = 6  # messages interpolated into the SQL prompt
+MAX_PLOT_POINTS = 5000  # down-sample results beyond this before charting
+
+# Gemini often fences its SQL in ```sql ... ``` despite instructions;
+# compiled once so stripping is a single C-level substitution per turn
+_FENCE_RE = re.compile(r"^\s*```(?:sql)?\s*|\s*```\s*$", re.IGNORECASE)
 
 class DatabaseManager:
     def __init__(self):
         self.db = None
-        
+        self._engine = None
+        self._schema_cache = None
+
     def init_database(self, db_user: str, db_password: str, db_host: str, db_name: str) -> SQLDatabase:
         try:
             connection_string = f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}"
             self.db = SQLDatabase.from_uri(connection_string)
+            self._engine = self.db._engine
+            self._schema_cache = None
             return self.db
         except Exception as e:
             raise ConnectionError(f"Failed to connect to database: {str(e)}")
-    
+
     def get_schema(self):
         if not self.db:
             raise ValueError("Database not initialized")
-        return self.db.get_table_info()
+        # Schema introspection hits information_schema; it rarely changes
+        # within a session, so fetch it once per connection.
+        if self._schema_cache is None:
+            self._schema_cache = self.db.get_table_info()
+        return self._schema_cache
     
-    def execute_query(self, query: str):
+    def execute_query(self, query: str) -> pd.DataFrame:
         if not self.db:
             raise ValueError("Database not initialized")
-        return self.db.run(query)
+        # read_sql_query fetches through the driver and returns a typed
+        # DataFrame, unlike SQLDatabase.run() which stringifies the rows and
+        # forces downstream code to re-parse them.
+        return pd.read_sql_query(query, self._engine)
+
+class SemanticCache:
+    """Reuse SQL and responses for near-duplicate questions.
+
+    Questions are embedded once and stored as rows of a single float32 matrix,
+    so a lookup is one matrix-vector product (~1 ms for thousands of entries)
+    instead of two Gemini round-trips. Entries above the cosine threshold are
+    considered paraphrases of an earlier question.
+    """
+    SIMILARITY_THRESHOLD = 0.85
 
-class QueryGenerator:
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-pro')
-        
-    def get_sql_chain(self, schema, chat_history, question):
-        template = """
+        self.embeddings = None
+        self.entries = []  # (user_query, sql_query, nl_response)
+
+    @staticmethod
+    def _embed(text: str) -> np.ndarray:
+        result = genai.embed_content(model="models/embedding-001", content=text)
+        vec = np.asarray(result["embedding"], dtype=np.float32)
+        return vec / np.linalg.norm(vec)
+
+    def lookup(self, user_query: str):
+        if self.embeddings is None:
+            return None
+        try:
+            q_vec = self._embed(user_query)
+        except Exception:
+            return None
+        scores = self.embeddings @ q_vec
+        best = int(np.argmax(scores))
+        if scores[best] > self.SIMILARITY_THRESHOLD:
+            _, sql_query, nl_response = self.entries[best]
+            return sql_query, nl_response
+        return None
+
+    def add(self, user_query: str, sql_query: str, nl_response: str):
+        try:
+            q_vec = self._embed(user_query)
+        except Exception:
+            return
+        if self.embeddings is None:
+            self.embeddings = q_vec[None, :]
+        else:
+            self.embeddings = np.vstack([self.embeddings, q_vec[None, :]])
+        self.entries.append((user_query, sql_query, nl_response))
+
+def _append_message(role: str, text: str):
+    st.session_state.chat_roles.append(role)
+    st.session_state.chat_texts.append(text)
+
+def _submit_with_ctx(executor, fn, *args):
+    """Submit fn to the executor with the Streamlit script-run context attached.
+
+    Worker threads need the context to read st.session_state (e.g. for the
+    response cache); without it Streamlit raises a missing-ScriptRunContext
+    error.
+    """
+    ctx = get_script_run_ctx()
+
+    def _run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    return executor.submit(_run)
+
+def _summarize_result(df: pd.DataFrame) -> dict:
+    """Build a compact view of a result set for prompt interpolation.
+
+    Gemini sees the columns, row count, a small sample and summary
+    statistics instead of every row, so prompt tokens scale with the number
+    of columns rather than the result size.
+    """
+    return {
+        "columns": list(df.columns),
+        "n_rows": len(df),
+        "sample": df.head(10).to_dict(orient='records'),
+        "stats": df.describe(include='all').to_dict(),
+    }
+
+def _cached_generate(model, prompt: str) -> str:
+    """Generate a response for the prompt, reusing cached text for exact repeats.
+
+    The cache lives in session state so it survives Streamlit reruns; keys are
+    MD5 hashes of the prompt so identical prompts skip the Gemini round-trip.
+    """
+    cache = st.session_state.setdefault("llm_cache", {})
+    key = hashlib.md5(prompt.encode()).hexdigest()
+    if key not in cache:
+        cache[key] = model.generate_content(prompt).text
+    return cache[key]
+
+def _cached_generate_stream(model, prompt: str):
+    """Streaming counterpart of _cached_generate.
+
+    Yields response chunks as Gemini produces them so the UI can render
+    incrementally, then stores the concatenated text under the same MD5 key
+    so exact repeats are served from the cache in one piece.
+    """
+    cache = st.session_state.setdefault("llm_cache", {})
+    key = hashlib.md5(prompt.encode()).hexdigest()
+    if key in cache:
+        yield cache[key]
+        return
+    chunks = []
+    for chunk in model.generate_content(prompt, stream=True):
+        chunks.append(chunk.text)
+        yield chunk.text
+    cache[key] = "".join(chunks)
+
+class QueryGenerator:
+    # The SQL prompt pre-split at its interpolation points; joining constant
+    # fragments once per turn avoids re-scanning the whole template (and the
+    # interpolated schema/history) with str.format on every message.
+    _SQL_PARTS = (
+        """
         You are an expert in creating MySQL-compatible SQL queries!
         Always ensure the SQL command uses proper MySQL syntax.
         Based on the table schema below, write a MySQL SQL query that answers the user's question.
@@ -54,15 +192,39 @@ class QueryGenerator:
         1. Identifiers like table and column names are enclosed in backticks (`) if needed.
         2. Avoid unnecessary keywords or decorations.
 
-        Schema: {schema}
+        Schema: """,
+        """
 
-        Conversation History: {chat_history}
+        Conversation History: """,
+        """
 
         Generate only the SQL query. Do not include any extra text, comments, or decorators.
 
-        Question: {question}
-    """   
-        return template.format(schema=schema, chat_history=chat_history, question=question)
+        Question: """,
+        "\n    "
+    )
+
+    def __init__(self):
+        self.model = _MODEL
+
+    def get_sql_chain(self, schema, chat_roles, chat_texts, question):
+        # Only the last few messages go into the prompt; the full history is
+        # kept in session state for display. This bounds prompt size (and
+        # Gemini latency/cost) regardless of conversation length.
+        history_str = "\n".join(
+            f"{role}: {text}"
+            for role, text in zip(
+                chat_roles[-CHAT_HISTORY_WINDOW:],
+                chat_texts[-CHAT_HISTORY_WINDOW:]
+            )
+        )
+        parts = self._SQL_PARTS
+        return "".join((
+            parts[0], schema,
+            parts[1], history_str,
+            parts[2], question,
+            parts[3]
+        ))
 
     def get_visualization_recommendation(self, sql_result):
         prompt = """
@@ -72,14 +234,13 @@ class QueryGenerator:
         
         Data:
         {data}
-        
+
         Return response in JSON format:
         {{"viz_type": "", "x_column": "", "y_column": "", "title": ""}}
-        """.format(data=sql_result)
+        """.format(data=_summarize_result(sql_result))
         
         try:
-            response = self.model.generate_content(prompt)
-            return json.loads(response.text)
+            return json.loads(_cached_generate(self.model, prompt))
         except:
             return None
 
@@ -98,45 +259,71 @@ class QueryGenerator:
         Results: {sql_response}
         
         Response:
-        """.format(sql_query=sql_query, schema=schema, sql_response=sql_response)
+        """.format(sql_query=sql_query, schema=schema, sql_response=_summarize_result(sql_response))
         
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            return f"Error generating response: {str(e)}"
+        return _cached_generate_stream(self.model, prompt)
 
-class DataVisualizer:
-    @staticmethod
-    def create_visualization(data, viz_config):
-        if not isinstance(data, pd.DataFrame):
-            data = pd.DataFrame(data)
-            
-        viz_type = viz_config.get('viz_type', 'bar')
-        x_col = viz_config.get('x_column')
-        y_col = viz_config.get('y_column')
-        title = viz_config.get('title', 'Data Visualization')
-        
-        if viz_type == 'bar':
-            fig = px.bar(data, x=x_col, y=y_col, title=title)
-        elif viz_type == 'line':
-            fig = px.line(data, x=x_col, y=y_col, title=title)
-        elif viz_type == 'scatter':
-            fig = px.scatter(data, x=x_col, y=y_col, title=title)
-        elif viz_type == 'pie':
-            fig = px.pie(data, values=y_col, names=x_col, title=title)
-        
-        return fig
+@st.cache_data(hash_funcs={pd.DataFrame: lambda df: pd.util.hash_pandas_object(df).sum()})
+def create_visualization(data: pd.DataFrame, viz_config):
+    """Build (or reuse) the Plotly figure for a result set.
+
+    st.cache_data keys on a pandas content hash plus the viz config, so
+    reruns with an unchanged result skip re-serializing the figure's trace
+    JSON. Oversized results are down-sampled first - the browser-side
+    renderer is O(points).
+    """
+    if len(data) > MAX_PLOT_POINTS:
+        data = data.sample(MAX_PLOT_POINTS)
+
+    viz_type = viz_config.get('viz_type', 'bar')
+    x_col = viz_config.get('x_column')
+    y_col = viz_config.get('y_column')
+    title = viz_config.get('title', 'Data Visualization')
+
+    if viz_type == 'bar':
+        fig = px.bar(data, x=x_col, y=y_col, title=title)
+    elif viz_type == 'line':
+        fig = px.line(data, x=x_col, y=y_col, title=title)
+    elif viz_type == 'scatter':
+        fig = px.scatter(data, x=x_col, y=y_col, title=title)
+    elif viz_type == 'pie':
+        fig = px.pie(data, values=y_col, names=x_col, title=title)
+
+    return fig
+
+@st.cache_resource
+def get_query_generator() -> QueryGenerator:
+    """Build the QueryGenerator once and share it across reruns and sessions.
+
+    Constructing the GenerativeModel costs hundreds of ms of SDK setup, which
+    would otherwise be paid whenever session state is evicted or a new tab
+    opens.
+    """
+    return QueryGenerator()
+
+@st.cache_resource
+def get_database_manager(db_user: str, db_password: str, db_host: str, db_name: str) -> DatabaseManager:
+    """Connect once per unique set of credentials and reuse the manager.
+
+    The cached manager also carries the schema cache, so new tabs skip both
+    the connection handshake and the information_schema introspection.
+    """
+    manager = DatabaseManager()
+    manager.init_database(db_user, db_password, db_host, db_name)
+    return manager
 
 def initialize_session_state():
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = [
-            AIMessage(content="👋 Hello! I'm your SQL Assistant. I can help you query your database, analyze data, and create visualizations. How can I help you today?"),
+    # Chat history is kept as two parallel lists (structure of arrays) so the
+    # display loop is a plain zip with no per-message isinstance dispatch
+    if "chat_roles" not in st.session_state:
+        st.session_state.chat_roles = ["ai"]
+        st.session_state.chat_texts = [
+            "👋 Hello! I'm your SQL Assistant. I can help you query your database, analyze data, and create visualizations. How can I help you today?"
         ]
-    if "db_manager" not in st.session_state:
-        st.session_state.db_manager = DatabaseManager()
     if "query_generator" not in st.session_state:
-        st.session_state.query_generator = QueryGenerator()
+        st.session_state.query_generator = get_query_generator()
+    if "semantic_cache" not in st.session_state:
+        st.session_state.semantic_cache = SemanticCache()
 
 def create_sidebar():
     with st.sidebar:
@@ -151,8 +338,9 @@ def create_sidebar():
         if st.button("Connect", key="connect_button"):
             try:
                 with st.spinner("🔄 Connecting to database..."):
-                    db = st.session_state.db_manager.init_database(user, password, host, database)
-                    st.session_state.db = db
+                    db_manager = get_database_manager(user, password, host, database)
+                    st.session_state.db_manager = db_manager
+                    st.session_state.db = db_manager.db
                     st.success("✅ Connected successfully!")
                     
                     # Display database info
@@ -180,65 +368,105 @@ def main():
     create_sidebar()
     
     # Display chat history
-    for message in st.session_state.chat_history:
-        with st.chat_message("ai" if isinstance(message, AIMessage) else "human"):
-            st.markdown(message.content)
+    for role, text in zip(st.session_state.chat_roles, st.session_state.chat_texts):
+        with st.chat_message(role):
+            st.markdown(text)
     
     # Handle user input
     user_query = st.chat_input("Ask a question about your data...")
     
     if user_query and "db" in st.session_state:
         # Add user message to history
-        st.session_state.chat_history.append(HumanMessage(content=user_query))
+        _append_message("human", user_query)
         with st.chat_message("human"):
             st.markdown(user_query)
             
         with st.chat_message("ai"):
             try:
                 with st.spinner("🤔 Thinking..."):
+                    # Check for a semantically similar earlier question first
+                    cached = st.session_state.semantic_cache.lookup(user_query)
+                    if cached:
+                        sql_query, response = cached
+                        if st.session_state.show_sql:
+                            st.code(sql_query, language="sql")
+                        st.markdown(response)
+                        _append_message("ai", response)
+                        return
+
                     # Generate and execute SQL query
                     schema = st.session_state.db_manager.get_schema()
                     prompt = st.session_state.query_generator.get_sql_chain(
-                        schema, 
-                        st.session_state.chat_history, 
+                        schema,
+                        st.session_state.chat_roles,
+                        st.session_state.chat_texts,
                         user_query
                     )
-                    sql_query = st.session_state.query_generator.model.generate_content(prompt).text
-                    
+                    sql_query = _FENCE_RE.sub("", _cached_generate(st.session_state.query_generator.model, prompt)).strip()
+
                     if st.session_state.show_sql:
                         st.code(sql_query, language="sql")
                     
-                    # Execute query with retry logic
+                    # Execute the query. Transient connection errors back off
+                    # exponentially with jitter; anything else means Gemini
+                    # produced bad SQL, so fail fast and re-prompt it with the
+                    # error instead of waiting out retry delays.
                     for attempt in range(MAX_RETRIES):
                         try:
                             sql_response = st.session_state.db_manager.execute_query(sql_query)
                             break
+                        except (OperationalError, InterfaceError) as e:
+                            if attempt == MAX_RETRIES - 1:
+                                raise e
+                            time.sleep(RETRY_BASE_DELAY * (2 ** attempt) + random.random() * 0.1)
                         except Exception as e:
                             if attempt == MAX_RETRIES - 1:
                                 raise e
-                            time.sleep(RETRY_DELAY)
+                            sql_query = _FENCE_RE.sub("", _cached_generate(
+                                st.session_state.query_generator.model,
+                                f"{prompt}\n\nThe previous query:\n{sql_query}\n"
+                                f"failed with this MySQL error: {e}\n"
+                                f"Generate a corrected SQL query only."
+                            )).strip()
+                            if st.session_state.show_sql:
+                                st.code(sql_query, language="sql")
                     
-                    # Generate natural language response
-                    response = st.session_state.query_generator.generate_natural_language_response(
-                        sql_query, 
-                        schema, 
-                        sql_response
-                    )
-                    st.markdown(response)
-                    
-                    # Create visualization if enabled
-                    if st.session_state.enable_viz and isinstance(sql_response, (list, dict)):
-                        viz_config = st.session_state.query_generator.get_visualization_recommendation(sql_response)
-                        if viz_config:
-                            fig = DataVisualizer.create_visualization(sql_response, viz_config)
-                            st.plotly_chart(fig)
+                    # The analysis stream and the visualization recommendation
+                    # are independent once the query has run, so overlap them:
+                    # the recommendation runs in a worker thread while the
+                    # analysis streams in the foreground.
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                        viz_future = None
+                        if st.session_state.enable_viz and not sql_response.empty:
+                            viz_future = _submit_with_ctx(
+                                executor,
+                                st.session_state.query_generator.get_visualization_recommendation,
+                                sql_response
+                            )
+
+                        # Stream the natural language response as it is generated
+                        response = st.write_stream(
+                            st.session_state.query_generator.generate_natural_language_response(
+                                sql_query,
+                                schema,
+                                sql_response
+                            )
+                        )
+
+                        # Create visualization if enabled
+                        if viz_future:
+                            viz_config = viz_future.result()
+                            if viz_config:
+                                fig = create_visualization(sql_response, viz_config)
+                                st.plotly_chart(fig)
                     
-                    # Add response to chat history
-                    st.session_state.chat_history.append(AIMessage(content=response))
+                    # Add response to chat history and the semantic cache
+                    _append_message("ai", response)
+                    st.session_state.semantic_cache.add(user_query, sql_query, response)
                     
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
-                st.session_state.chat_history.append(AIMessage(content=f"I encountered an error: {str(e)}"))
+                _append_message("ai", f"I encountered an error: {str(e)}")
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,27 @@
 import mysql.connector
 from datetime import datetime, timedelta
-import random
 import faker
 import pandas as pd
 import numpy as np
+from numba import njit
+
+@njit(cache=True)
+def _compute_totals(product_ids, quantities, prices, num_items):
+    """Compute per-item subtotals and per-order totals at machine speed.
+
+    prices is a dense float64 array indexed by product_id; num_items gives
+    how many consecutive rows of product_ids/quantities belong to each order.
+    cache=True persists the compiled code so repeat runs skip the JIT tax.
+    """
+    subtotals = np.empty(product_ids.size, dtype=np.float64)
+    order_totals = np.zeros(num_items.size, dtype=np.float64)
+    idx = 0
+    for order in range(num_items.size):
+        for _ in range(num_items[order]):
+            subtotals[idx] = prices[product_ids[idx]] * quantities[idx]
+            order_totals[order] += subtotals[idx]
+            idx += 1
+    return subtotals, order_totals
 
 class DatabaseSetup:
     def __init__(self, host, user, password, database):
@@ -14,8 +32,25 @@ class DatabaseSetup:
         )
         self.cursor = self.conn.cursor()
         self.database = database
+        faker.Faker.seed(0)
         self.fake = faker.Faker()
         
+    def _bulk_insert(self, table, columns, rows, chunk_size=1000):
+        """Insert rows as extended multi-row VALUES statements.
+
+        Each statement carries up to chunk_size rows, so the server sees one
+        parse and one round trip per chunk instead of one per row, while the
+        chunking keeps each packet under max_allowed_packet. Values still go
+        through driver placeholders for escaping.
+        """
+        row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            sql = prefix + ", ".join([row_placeholder] * len(chunk))
+            params = [value for row in chunk for value in row]
+            self.cursor.execute(sql, params)
+
     def create_database(self):
         self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
         self.cursor.execute(f"USE {self.database}")
@@ -130,18 +165,28 @@ class DatabaseSetup:
             ]
         }
 
-        # Generate products
+        # Generate products; numeric columns are drawn in bulk rather than
+        # one interpreter-level RNG call per row
+        rng = np.random.default_rng()
+        n_products = sum(len(names) for names in product_names.values())
+        product_prices = np.round(rng.uniform(10, 1000, size=n_products), 2).tolist()
+        stock_quantities = rng.integers(0, 1001, size=n_products).tolist()
+        descriptions = [self.fake.text(max_nb_chars=100) for _ in range(n_products)]
+
         products = []
-        for category_id in range(1, 6):
-            for product_name in product_names[category_id]:
-                product = (
-                    category_id,
-                    product_name,
-                    self.fake.text(max_nb_chars=100),
-                    round(random.uniform(10, 1000), 2),
-                    random.randint(0, 1000)
-                )
-                products.append(product)
+        for (category_id, product_name), description, price, stock in zip(
+            ((cid, name) for cid in range(1, 6) for name in product_names[cid]),
+            descriptions,
+            product_prices,
+            stock_quantities
+        ):
+            products.append((
+                category_id,
+                product_name,
+                description,
+                price,
+                stock
+            ))
 
         self.cursor.executemany(
             """INSERT INTO products 
@@ -151,13 +196,14 @@ class DatabaseSetup:
         )
         self.conn.commit()
 
-        # Generate customers
+        # Generate customers; fake.unique guarantees distinct emails so the
+        # batch insert cannot trip over the UNIQUE constraint mid-way
         customers = []
         for _ in range(100):  # 100 customers
             customer = (
                 self.fake.first_name(),
                 self.fake.last_name(),
-                self.fake.email(),
+                self.fake.unique.email(),
                 self.fake.phone_number(),
                 self.fake.address()
             )
@@ -173,50 +219,71 @@ class DatabaseSetup:
 
         # Generate orders and order items
         order_statuses = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
-        
-        for _ in range(1000):  # 1000 orders
-            # Generate order
-            customer_id = random.randint(1, 100)
-            order_date = self.fake.date_time_between(start_date='-1y', end_date='now')
-            status = random.choice(order_statuses)
-            
-            # Insert order
-            self.cursor.execute(
-                """INSERT INTO orders 
-                   (customer_id, order_date, total_amount, status, shipping_address)
-                   VALUES (%s, %s, %s, %s, %s)""",
-                (customer_id, order_date, 0, status, self.fake.address())
-            )
-            order_id = self.cursor.lastrowid
-
-            # Generate order items
-            total_amount = 0
-            num_items = random.randint(1, 5)
-            
-            for _ in range(num_items):
-                product_id = random.randint(1, 50)
-                quantity = random.randint(1, 5)
-                
-                # Get product price
-                self.cursor.execute("SELECT price FROM products WHERE product_id = %s", (product_id,))
-                unit_price = self.cursor.fetchone()[0]
-                subtotal = unit_price * quantity
-
-                # Insert order item
-                self.cursor.execute(
-                    """INSERT INTO order_items 
-                       (order_id, product_id, quantity, unit_price, subtotal)
-                       VALUES (%s, %s, %s, %s, %s)""",
-                    (order_id, product_id, quantity, unit_price, subtotal)
-                )
-                
-                total_amount += subtotal
-
-            # Update order total
-            self.cursor.execute(
-                "UPDATE orders SET total_amount = %s WHERE order_id = %s",
-                (total_amount, order_id)
-            )
+
+        # Load all product prices once instead of one SELECT per order item
+        self.cursor.execute("SELECT product_id, price FROM products")
+        prices = dict(self.cursor.fetchall())
+
+        # Draw everything random for 1000 orders in a handful of bulk calls
+        customer_ids = rng.integers(1, 101, size=1000).tolist()
+        statuses = rng.choice(order_statuses, size=1000).tolist()
+        num_items = rng.integers(1, 6, size=1000)
+        total_items = int(num_items.sum())
+        item_product_ids = rng.integers(1, 51, size=total_items)
+        item_quantities = rng.integers(1, 6, size=total_items)
+
+        # Dense float64 price lookup indexed by product_id for the JIT;
+        # Decimal arithmetic per item is far slower than compiled float math
+        price_lookup = np.zeros(max(prices) + 1, dtype=np.float64)
+        for product_id, price in prices.items():
+            price_lookup[product_id] = float(price)
+
+        subtotals, order_totals = _compute_totals(
+            item_product_ids, item_quantities, price_lookup, num_items
+        )
+
+        # Pre-draw the Faker values in their own passes so RNG work does not
+        # interleave with tuple assembly
+        order_dates = [
+            self.fake.date_time_between(start_date='-1y', end_date='now')
+            for _ in range(1000)
+        ]
+        shipping_addresses = [self.fake.address() for _ in range(1000)]
+
+        orders = list(zip(
+            customer_ids,
+            order_dates,
+            np.round(order_totals, 2).tolist(),
+            statuses,
+            shipping_addresses
+        ))
+
+        self.cursor.executemany(
+            """INSERT INTO orders
+               (customer_id, order_date, total_amount, status, shipping_address)
+               VALUES (%s, %s, %s, %s, %s)""",
+            orders
+        )
+
+        # MySQL assigns sequential AUTO_INCREMENT ids to a batch insert
+        # starting at lastrowid, so order ids can be derived without querying
+        first_order_id = self.cursor.lastrowid
+        item_order_ids = np.repeat(
+            np.arange(first_order_id, first_order_id + num_items.size), num_items
+        )
+        order_items = list(zip(
+            item_order_ids.tolist(),
+            item_product_ids.tolist(),
+            item_quantities.tolist(),
+            price_lookup[item_product_ids].tolist(),
+            np.round(subtotals, 2).tolist()
+        ))
+
+        self._bulk_insert(
+            "order_items",
+            ("order_id", "product_id", "quantity", "unit_price", "subtotal"),
+            order_items
+        )
 
         self.conn.commit()
         print("Sample data generated successfully!")